@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Notificaciones de drift detection.
+
+Acumula los eventos de drift de una ejecución y envía un único resumen por
+canal (Teams, webhook genérico) al finalizar, con reintentos y backoff
+exponencial. Un webhook lento o caído no bloquea el procesamiento de los
+workspaces.
+
+Uso:
+  python3 drift_notifications.py record --environment dev --workspace default \\
+      --hash 1a2b3c4d --issue-url https://github.com/owner/repo/issues/1 --issue-status created
+  python3 drift_notifications.py send
+
+Variables de entorno:
+  DRIFT_EVENTS_FILE           Archivo JSONL de eventos (default: drift_events.jsonl)
+  TEAMS_WEBHOOK_URL           Webhook de Microsoft Teams (opcional)
+  DRIFT_WEBHOOK_URL           Webhook genérico que recibe el resumen en JSON (opcional)
+  DRIFT_NOTIFY_MAX_ATTEMPTS   Intentos máximos por canal (default: 4)
+  DRIFT_NOTIFY_BACKOFF        Segundos de espera base entre reintentos (default: 2)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+DEFAULT_EVENTS_FILE = 'drift_events.jsonl'
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF = 2.0
+MAX_BACKOFF = 60.0
+REQUEST_TIMEOUT = 10
+
+# Códigos HTTP que justifican un reintento
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class NotificationError(Exception):
+    """Error definitivo al enviar una notificación"""
+
+
+class RetryableError(Exception):
+    """Error transitorio al enviar una notificación"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DriftDigest:
+    """Resumen de todos los eventos de drift de una ejecución"""
+
+    def __init__(self, events, repository=None, run_url=None):
+        self.events = events
+        self.repository = repository
+        self.run_url = run_url
+
+    def by_workspace(self):
+        """Agrupar eventos por ambiente/workspace"""
+        groups = OrderedDict()
+        for event in self.events:
+            key = f"{event.get('environment', '-')}/{event.get('workspace', '-')}"
+            groups.setdefault(key, []).append(event)
+        return groups
+
+    def to_dict(self):
+        """Representación JSON del resumen"""
+        return {
+            'repository': self.repository,
+            'run_url': self.run_url,
+            'total_events': len(self.events),
+            'total_workspaces': len(self.by_workspace()),
+            'workspaces': [
+                {'workspace': key, 'events': events}
+                for key, events in self.by_workspace().items()
+            ],
+        }
+
+    def to_markdown(self):
+        """Representación en Markdown del resumen"""
+        groups = self.by_workspace()
+        project = f" en el proyecto **{self.repository}**" if self.repository else ""
+        lines = [f"⚠️ **Drift detectado en {len(groups)} workspace(s)**{project}", ""]
+
+        for key, events in groups.items():
+            lines.append(f"- **{key}**")
+            for event in events:
+                issue_url = event.get('issue_url')
+                issue = f"[issue]({issue_url})" if issue_url else "sin issue"
+                status = event.get('issue_status', 'unknown')
+                lines.append(f"  - `{event.get('hash', '-')}` → {issue} ({status})")
+
+        if self.run_url:
+            lines += ["", f"[Ver ejecución]({self.run_url})"]
+        return "\n".join(lines)
+
+
+def parse_retry_after(value, now=None):
+    """Convertir el header Retry-After (segundos o fecha HTTP) a segundos"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+class WebhookSink:
+    """Canal de notificación vía webhook genérico (JSON)"""
+
+    name = 'webhook'
+    env_var = 'DRIFT_WEBHOOK_URL'
+
+    def __init__(self, url):
+        self.url = url
+
+    def build_payload(self, digest):
+        """Construir el cuerpo del mensaje"""
+        return digest.to_dict()
+
+    def send(self, digest):
+        """Enviar el resumen (bloqueante, se ejecuta en un thread)"""
+        try:
+            response = requests.post(self.url, json=self.build_payload(digest), timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableError(str(e))
+        except requests.RequestException as e:
+            # URL mal configurada, redirecciones infinitas, etc.: reintentar no sirve
+            raise NotificationError(str(e))
+
+        if response.status_code in RETRYABLE_STATUS:
+            raise RetryableError(
+                f"HTTP {response.status_code}",
+                retry_after=parse_retry_after(response.headers.get('Retry-After')),
+            )
+        if response.status_code >= 400:
+            raise NotificationError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+
+class TeamsSink(WebhookSink):
+    """Canal de notificación vía webhook de Microsoft Teams"""
+
+    name = 'teams'
+    env_var = 'TEAMS_WEBHOOK_URL'
+
+    def build_payload(self, digest):
+        """Construir el mensaje de Teams"""
+        return {'text': digest.to_markdown()}
+
+
+# Canales disponibles; para agregar uno nuevo basta con registrarlo aquí
+SINKS = OrderedDict((sink.name, sink) for sink in (TeamsSink, WebhookSink))
+
+
+def configured_sinks():
+    """Instanciar los canales cuyo webhook está configurado"""
+    return [sink(os.environ[sink.env_var]) for sink in SINKS.values() if os.getenv(sink.env_var)]
+
+
+async def deliver(sink, digest, max_attempts, backoff):
+    """Enviar el resumen a un canal con reintentos y backoff exponencial"""
+    for attempt in range(1, max_attempts + 1):
+        try:
+            await asyncio.to_thread(sink.send, digest)
+            print(f"✅ Notificación enviada a '{sink.name}' (intento {attempt})")
+            return True
+        except NotificationError as e:
+            print(f"❌ Error enviando notificación a '{sink.name}': {e}")
+            return False
+        except RetryableError as e:
+            if attempt == max_attempts:
+                print(f"❌ Notificación a '{sink.name}' falló tras {attempt} intentos: {e}")
+                return False
+            delay = e.retry_after if e.retry_after is not None else backoff * 2 ** (attempt - 1)
+            # Acotar también el Retry-After del servidor para no bloquear el workflow
+            delay = min(delay, MAX_BACKOFF)
+            print(f"⚠️ Error transitorio en '{sink.name}' ({e}). Reintentando en {delay:.1f}s...")
+            await asyncio.sleep(delay)
+        except Exception as e:
+            # Un canal roto no debe cancelar los reintentos de los demás
+            print(f"❌ Error inesperado enviando notificación a '{sink.name}': {e!r}")
+            return False
+    return False
+
+
+async def dispatch(sinks, digest, max_attempts, backoff):
+    """Enviar el resumen a todos los canales en paralelo"""
+    return await asyncio.gather(*(deliver(sink, digest, max_attempts, backoff) for sink in sinks))
+
+
+def load_events(events_file):
+    """Leer los eventos registrados durante la ejecución"""
+    if not os.path.exists(events_file):
+        return []
+
+    events = []
+    with open(events_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                print(f"⚠️ Evento inválido ignorado: {line[:80]}")
+    return events
+
+
+def cmd_record(args):
+    """Registrar un evento de drift"""
+    event = {
+        'environment': args.environment,
+        'workspace': args.workspace,
+        'hash': args.hash,
+        'issue_url': args.issue_url or None,
+        'issue_status': args.issue_status,
+        'detected_at': datetime.now(timezone.utc).isoformat(),
+    }
+    events_dir = os.path.dirname(args.events_file)
+    if events_dir:
+        os.makedirs(events_dir, exist_ok=True)
+    with open(args.events_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(event) + "\n")
+
+    print(f"📝 Evento de drift registrado para '{args.workspace}'")
+    return 0
+
+
+def cmd_send(args):
+    """Enviar el resumen de drift a los canales configurados"""
+    events = load_events(args.events_file)
+    if not events:
+        print("ℹ️ No hay eventos de drift. No se envían notificaciones.")
+        return 0
+
+    sinks = configured_sinks()
+    if not sinks:
+        print("ℹ️ Ningún webhook configurado. Se omiten las notificaciones.")
+        return 0
+
+    run_url = None
+    if os.getenv('GITHUB_RUN_ID'):
+        run_url = (f"{os.getenv('GITHUB_SERVER_URL', 'https://github.com')}/"
+                   f"{os.getenv('GITHUB_REPOSITORY')}/actions/runs/{os.getenv('GITHUB_RUN_ID')}")
+    digest = DriftDigest(events, repository=os.getenv('GITHUB_REPOSITORY'), run_url=run_url)
+
+    print(f"📨 Enviando resumen de {len(events)} evento(s) a: {', '.join(s.name for s in sinks)}")
+    results = asyncio.run(dispatch(sinks, digest, args.max_attempts, args.backoff))
+
+    # Las notificaciones no deben romper el workflow salvo que se pida explícitamente
+    if args.strict and not all(results):
+        return 1
+    return 0
+
+
+def build_parser():
+    """Construir el parser de argumentos"""
+    parser = argparse.ArgumentParser(description="Notificaciones de drift detection")
+    parser.add_argument('--events-file', default=os.getenv('DRIFT_EVENTS_FILE', DEFAULT_EVENTS_FILE),
+                        help="Archivo JSONL de eventos")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help="Registrar un evento de drift")
+    record.add_argument('--environment', required=True, help="Ambiente (ej: dev)")
+    record.add_argument('--workspace', required=True, help="Workspace de Terraform")
+    record.add_argument('--hash', required=True, help="Hash del plan con drift")
+    record.add_argument('--issue-url', default=None, help="URL del issue de GitHub")
+    record.add_argument('--issue-status', default='created', choices=['created', 'existing', 'error'],
+                        help="Estado del issue asociado")
+    record.set_defaults(func=cmd_record)
+
+    send = subparsers.add_parser('send', help="Enviar el resumen a los canales configurados")
+    send.add_argument('--max-attempts', type=int,
+                      default=int(os.getenv('DRIFT_NOTIFY_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)),
+                      help="Intentos máximos por canal")
+    send.add_argument('--backoff', type=float,
+                      default=float(os.getenv('DRIFT_NOTIFY_BACKOFF', DEFAULT_BACKOFF)),
+                      help="Segundos de espera base entre reintentos")
+    send.add_argument('--strict', action='store_true',
+                      help="Salir con error si algún canal falla")
+    send.set_defaults(func=cmd_send)
+
+    return parser
+
+
+def main(argv=None):
+    """Función principal"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
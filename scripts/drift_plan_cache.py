@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Cache de planes de drift detection.
+
+Evita volver a ejecutar `terraform plan` contra AWS cuando ni la configuración
+(environments/<env>, modules/ y .terraform.lock.hcl) ni el state del workspace
+cambiaron desde el último plan limpio.
+
+Uso:
+  python3 drift_plan_cache.py check  --env-dir environments/dev --workspace default
+  python3 drift_plan_cache.py record --env-dir environments/dev --workspace default --exit-code 0 \
+      --started-at 2025-12-04T06:00:00+00:00
+
+Códigos de salida de `check`:
+  0  -> cache válido, se puede omitir el plan
+  10 -> hay que ejecutar el plan
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_CACHE_FILE = '.drift-cache/plan_cache.json'
+# Con el cron diario, 36 h queda lejos de 24 h y de 48 h: un plan limpio se
+# reutiliza en la ejecución siguiente y se vuelve a planificar en la posterior
+DEFAULT_MAX_AGE_HOURS = 36
+CACHE_VERSION = 1
+
+# Códigos de salida de `check`
+EXIT_SKIP = 0
+EXIT_PLAN = 10
+
+# Archivos que forman parte de la configuración de Terraform
+CONFIG_SUFFIXES = ('.tf', '.tf.json', '.tfvars', '.tfvars.json')
+LOCK_FILE = '.terraform.lock.hcl'
+IGNORED_DIRS = {'.terraform', '.git'}
+
+
+def _config_files(directory, recursive):
+    """Listar archivos de configuración Terraform de un directorio"""
+    files = []
+    if not os.path.isdir(directory):
+        return files
+
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS)
+        for name in sorted(names):
+            if name.endswith(CONFIG_SUFFIXES) or name == LOCK_FILE:
+                files.append(os.path.join(root, name))
+        if not recursive:
+            break
+
+    return files
+
+
+def config_fingerprint(env_dir, modules_dir):
+    """Calcular hash SHA-256 de la configuración raíz, módulos y lock file"""
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(modules_dir))
+
+    files = _config_files(env_dir, recursive=False) + _config_files(modules_dir, recursive=True)
+    for path in files:
+        # Usar rutas relativas para que el hash no dependa del checkout
+        rel_path = os.path.relpath(os.path.abspath(path), base_dir).replace(os.sep, '/')
+        digest.update(rel_path.encode('utf-8'))
+        digest.update(b'\0')
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+
+    return digest.hexdigest()
+
+
+def read_state_metadata(env_dir, state_file=None):
+    """Obtener serial y lineage del state (vía archivo o `terraform state pull`)"""
+    if state_file:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            raw = f.read()
+    else:
+        result = subprocess.run(
+            ['terraform', 'state', 'pull'],
+            cwd=env_dir,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"terraform state pull falló: {result.stderr.strip()}")
+        raw = result.stdout
+
+    if not raw.strip():
+        # Workspace sin state todavía
+        return {'serial': None, 'lineage': None}
+
+    state = json.loads(raw)
+    return {'serial': state.get('serial'), 'lineage': state.get('lineage')}
+
+
+def load_cache(cache_file):
+    """Cargar el cache desde disco (vacío si no existe o es inválido)"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {'version': CACHE_VERSION, 'entries': {}}
+
+    if cache.get('version') != CACHE_VERSION or not isinstance(cache.get('entries'), dict):
+        return {'version': CACHE_VERSION, 'entries': {}}
+    return cache
+
+
+def save_cache(cache_file, cache):
+    """Guardar el cache de forma atómica"""
+    cache_dir = os.path.dirname(cache_file)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, cache_file)
+
+
+def cache_key(env_dir, workspace):
+    """Clave del cache: ambiente + workspace"""
+    # abspath resuelve '.' al nombre real del ambiente (ej: environments/dev -> dev)
+    return f"{os.path.basename(os.path.abspath(env_dir))}/{workspace}"
+
+
+def is_fresh(entry, fingerprint, state, max_age, now=None):
+    """Determinar si una entrada del cache permite omitir el plan"""
+    if not entry:
+        return False, "sin plan previo en cache"
+    if entry.get('exit_code') != 0:
+        return False, "el último plan no fue limpio"
+    if entry.get('fingerprint') != fingerprint:
+        return False, "la configuración cambió"
+    if entry.get('lineage') != state['lineage'] or entry.get('serial') != state['serial']:
+        return False, "el state cambió"
+
+    now = now or datetime.now(timezone.utc)
+    try:
+        planned_at = datetime.fromisoformat(entry['planned_at'])
+    except (KeyError, TypeError, ValueError):
+        return False, "fecha de plan inválida"
+    if now - planned_at > max_age:
+        return False, "el plan en cache expiró"
+
+    return True, f"plan limpio del {entry['planned_at']}"
+
+
+def cmd_check(args):
+    """Verificar si el plan del workspace puede omitirse"""
+    fingerprint = config_fingerprint(args.env_dir, args.modules_dir)
+    try:
+        state = read_state_metadata(args.env_dir, args.state_file)
+    except (RuntimeError, OSError, ValueError) as e:
+        print(f"⚠️ No se pudo leer el state: {e}. Ejecutando plan.")
+        return EXIT_PLAN
+
+    entry = load_cache(args.cache_file)['entries'].get(cache_key(args.env_dir, args.workspace))
+    fresh, reason = is_fresh(entry, fingerprint, state, timedelta(hours=args.max_age_hours))
+
+    if fresh:
+        print(f"⏭️ Omitiendo plan para '{args.workspace}': {reason}")
+        return EXIT_SKIP
+
+    print(f"🔄 Plan requerido para '{args.workspace}': {reason}")
+    return EXIT_PLAN
+
+
+def cmd_record(args):
+    """Registrar el resultado de un plan en el cache"""
+    fingerprint = config_fingerprint(args.env_dir, args.modules_dir)
+    cache = load_cache(args.cache_file)
+    key = cache_key(args.env_dir, args.workspace)
+    try:
+        state = read_state_metadata(args.env_dir, args.state_file)
+    except (RuntimeError, OSError, ValueError) as e:
+        # Descartar la entrada previa para no omitir el próximo plan con un resultado viejo
+        if cache['entries'].pop(key, None) is not None:
+            save_cache(args.cache_file, cache)
+        print(f"⚠️ No se pudo leer el state: {e}. Entrada del cache descartada.")
+        return 0
+
+    cache['entries'][key] = {
+        'fingerprint': fingerprint,
+        'serial': state['serial'],
+        'lineage': state['lineage'],
+        'exit_code': args.exit_code,
+        'planned_at': (args.started_at or datetime.now(timezone.utc)).isoformat(),
+    }
+    save_cache(args.cache_file, cache)
+
+    print(f"💾 Resultado del plan registrado para '{args.workspace}' (exit code {args.exit_code})")
+    return 0
+
+
+def _timestamp(value):
+    """Parsear un timestamp ISO 8601 (UTC si no indica zona horaria)"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Timestamp inválido '{value}'. Use formato ISO 8601")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def build_parser():
+    """Construir el parser de argumentos"""
+    parser = argparse.ArgumentParser(description="Cache de planes para drift detection")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--env-dir', required=True, help="Directorio del ambiente (ej: environments/dev)")
+    common.add_argument('--workspace', required=True, help="Nombre del workspace de Terraform")
+    common.add_argument('--modules-dir', default=None, help="Directorio de módulos (default: <repo>/modules)")
+    common.add_argument('--cache-file', default=os.getenv('DRIFT_CACHE_FILE', DEFAULT_CACHE_FILE),
+                        help="Archivo JSON del cache")
+    common.add_argument('--state-file', default=None,
+                        help="Leer el state desde un archivo en lugar de `terraform state pull`")
+
+    check = subparsers.add_parser('check', parents=[common], help="Verificar si el plan puede omitirse")
+    check.add_argument('--max-age-hours', type=float,
+                       default=float(os.getenv('DRIFT_CACHE_MAX_AGE_HOURS', DEFAULT_MAX_AGE_HOURS)),
+                       help="Antigüedad máxima de un plan limpio en cache")
+    check.set_defaults(func=cmd_check)
+
+    record = subparsers.add_parser('record', parents=[common], help="Registrar el resultado de un plan")
+    record.add_argument('--exit-code', type=int, required=True,
+                        help="Exit code de `terraform plan -detailed-exitcode`")
+    record.add_argument('--started-at', type=_timestamp, default=None,
+                        help="Inicio del plan en ISO 8601 (default: ahora); la antigüedad se mide desde aquí")
+    record.set_defaults(func=cmd_record)
+
+    return parser
+
+
+def main(argv=None):
+    """Función principal"""
+    args = build_parser().parse_args(argv)
+    if args.modules_dir is None:
+        args.modules_dir = os.path.join(os.path.dirname(os.path.abspath(args.env_dir)), '..', 'modules')
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Tests de las notificaciones de drift contra un servidor HTTP local"""
+
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+import drift_notifications as notifications
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Registra cada POST y responde según la secuencia configurada por path"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, json.loads(body)))
+        responses = self.server.responses.get(self.path, [])
+        status, headers = responses.pop(0) if responses else (200, {})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.requests = []
+    server.responses = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def events_file(tmp_path, monkeypatch):
+    for var in ('TEAMS_WEBHOOK_URL', 'DRIFT_WEBHOOK_URL', 'GITHUB_RUN_ID'):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv('GITHUB_REPOSITORY', 'owner/repo')
+    return str(tmp_path / 'drift_events.jsonl')
+
+
+def record(events_file, workspace, hash_, issue_url=None, status='created'):
+    args = ['--events-file', events_file, 'record', '--environment', 'dev',
+            '--workspace', workspace, '--hash', hash_, '--issue-status', status]
+    if issue_url:
+        args += ['--issue-url', issue_url]
+    assert notifications.main(args) == 0
+
+
+def send(events_file, *extra):
+    return notifications.main(['--events-file', events_file, 'send', '--backoff', '0.01', *extra])
+
+
+def requests_to(server, path):
+    return [body for request_path, body in server.requests if request_path == path]
+
+
+def test_one_digest_per_sink(stub_server, events_file, monkeypatch):
+    monkeypatch.setenv('TEAMS_WEBHOOK_URL', f"{stub_server.url}/teams")
+    monkeypatch.setenv('DRIFT_WEBHOOK_URL', f"{stub_server.url}/hook")
+    record(events_file, 'default', 'aaaa1111', 'https://github.com/owner/repo/issues/1')
+    record(events_file, 'qa', 'bbbb2222', 'https://github.com/owner/repo/issues/2', status='existing')
+    record(events_file, 'qa', 'cccc3333', status='error')
+
+    assert send(events_file) == 0
+
+    teams = requests_to(stub_server, '/teams')
+    assert len(teams) == 1
+    text = teams[0]['text']
+    assert "Drift detectado en 2 workspace(s)" in text
+    assert "**owner/repo**" in text
+    assert "- **dev/default**" in text and "- **dev/qa**" in text
+    assert "[issue](https://github.com/owner/repo/issues/1) (created)" in text
+    assert "[issue](https://github.com/owner/repo/issues/2) (existing)" in text
+    assert "`cccc3333` → sin issue (error)" in text
+
+    hook = requests_to(stub_server, '/hook')
+    assert len(hook) == 1
+    assert hook[0]['total_events'] == 3
+    assert hook[0]['total_workspaces'] == 2
+    workspaces = {w['workspace']: w['events'] for w in hook[0]['workspaces']}
+    assert [e['hash'] for e in workspaces['dev/qa']] == ['bbbb2222', 'cccc3333']
+    assert workspaces['dev/default'][0]['issue_url'] == 'https://github.com/owner/repo/issues/1'
+
+
+def test_retries_transient_errors(stub_server, events_file, monkeypatch):
+    monkeypatch.setenv('DRIFT_WEBHOOK_URL', f"{stub_server.url}/hook")
+    stub_server.responses['/hook'] = [(503, {}), (200, {})]
+    record(events_file, 'default', 'aaaa1111')
+
+    assert send(events_file, '--strict') == 0
+    assert len(requests_to(stub_server, '/hook')) == 2
+
+
+def test_client_errors_are_terminal(stub_server, events_file, monkeypatch):
+    monkeypatch.setenv('DRIFT_WEBHOOK_URL', f"{stub_server.url}/hook")
+    stub_server.responses['/hook'] = [(400, {})]
+    record(events_file, 'default', 'aaaa1111')
+
+    assert send(events_file) == 0
+    assert len(requests_to(stub_server, '/hook')) == 1
+
+
+def test_strict_fails_when_retries_are_exhausted(stub_server, events_file, monkeypatch):
+    monkeypatch.setenv('DRIFT_WEBHOOK_URL', f"{stub_server.url}/hook")
+    stub_server.responses['/hook'] = [(503, {})] * 3
+    record(events_file, 'default', 'aaaa1111')
+
+    assert send(events_file, '--max-attempts', '3', '--strict') == 1
+    assert len(requests_to(stub_server, '/hook')) == 3
+
+
+@pytest.mark.parametrize('broken_url', ['hooks.example.com/drift', 'http://'])
+def test_broken_sink_does_not_stop_other_sinks(stub_server, events_file, monkeypatch, broken_url):
+    monkeypatch.setenv('TEAMS_WEBHOOK_URL', f"{stub_server.url}/teams")
+    monkeypatch.setenv('DRIFT_WEBHOOK_URL', broken_url)
+    stub_server.responses['/teams'] = [(503, {}), (200, {})]
+    record(events_file, 'default', 'aaaa1111')
+
+    assert send(events_file) == 0
+    assert len(requests_to(stub_server, '/teams')) == 2
+    assert send(events_file, '--strict') == 1
+
+
+def test_retry_after_is_capped(stub_server, events_file, monkeypatch):
+    monkeypatch.setenv('DRIFT_WEBHOOK_URL', f"{stub_server.url}/hook")
+    monkeypatch.setattr(notifications, 'MAX_BACKOFF', 0.05)
+    stub_server.responses['/hook'] = [(429, {'Retry-After': '3600'}), (200, {})]
+    record(events_file, 'default', 'aaaa1111')
+
+    started = time.monotonic()
+    assert send(events_file, '--strict') == 0
+    assert time.monotonic() - started < 5
+    assert len(requests_to(stub_server, '/hook')) == 2
+
+
+def test_parse_retry_after():
+    now = notifications.datetime(2015, 10, 21, 7, 27, tzinfo=notifications.timezone.utc)
+    assert notifications.parse_retry_after('7') == 7.0
+    assert notifications.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=now) == 60.0
+    assert notifications.parse_retry_after('Wed, 21 Oct 2015 07:00:00 GMT', now=now) == 0.0
+    assert notifications.parse_retry_after('invalid') is None
+    assert notifications.parse_retry_after(None) is None
+
+
+def test_no_events_is_noop(stub_server, events_file, monkeypatch):
+    monkeypatch.setenv('DRIFT_WEBHOOK_URL', f"{stub_server.url}/hook")
+    assert send(events_file, '--strict') == 0
+
+    open(events_file, 'w').close()
+    assert send(events_file, '--strict') == 0
+    assert stub_server.requests == []
+
+
+def test_no_sinks_is_noop(stub_server, events_file):
+    record(events_file, 'default', 'aaaa1111')
+    assert send(events_file, '--strict') == 0
+    assert stub_server.requests == []
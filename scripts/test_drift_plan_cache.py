@@ -0,0 +1,155 @@
+"""Tests del cache de planes de drift detection (backend local)"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import drift_plan_cache as cache
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """Repositorio mínimo con un ambiente, un módulo y un state local"""
+    env_dir = tmp_path / 'environments' / 'dev'
+    module_dir = tmp_path / 'modules' / 'vpc'
+    env_dir.mkdir(parents=True)
+    module_dir.mkdir(parents=True)
+    (env_dir / 'main.tf').write_text('module "vpc" { source = "../../modules/vpc" }\n')
+    (env_dir / '.terraform.lock.hcl').write_text('# lock\n')
+    (module_dir / 'main.tf').write_text('resource "aws_vpc" "this" {}\n')
+
+    state_file = tmp_path / 'terraform.tfstate'
+    write_state(state_file, serial=3, lineage='abc')
+    return {
+        'root': tmp_path,
+        'env_dir': str(env_dir),
+        'module_file': module_dir / 'main.tf',
+        'state_file': str(state_file),
+        'cache_file': str(tmp_path / '.drift-cache' / 'plan_cache.json'),
+    }
+
+
+def write_state(path, serial, lineage):
+    path.write_text(json.dumps({'version': 4, 'serial': serial, 'lineage': lineage, 'resources': []}))
+
+
+def run(repo, command, *extra):
+    return cache.main([
+        command,
+        '--env-dir', repo['env_dir'],
+        '--workspace', 'default',
+        '--state-file', repo['state_file'],
+        '--cache-file', repo['cache_file'],
+        *extra,
+    ])
+
+
+def test_fingerprint_changes_when_module_is_edited(repo):
+    modules_dir = str(repo['root'] / 'modules')
+    before = cache.config_fingerprint(repo['env_dir'], modules_dir)
+    assert cache.config_fingerprint(repo['env_dir'], modules_dir) == before
+
+    repo['module_file'].write_text('resource "aws_vpc" "this" { cidr_block = "10.0.0.0/16" }\n')
+    assert cache.config_fingerprint(repo['env_dir'], modules_dir) != before
+
+
+def test_fingerprint_ignores_terraform_dir(repo):
+    modules_dir = str(repo['root'] / 'modules')
+    before = cache.config_fingerprint(repo['env_dir'], modules_dir)
+
+    provider_dir = repo['root'] / 'modules' / 'vpc' / '.terraform'
+    provider_dir.mkdir()
+    (provider_dir / 'extra.tf').write_text('# generado\n')
+    assert cache.config_fingerprint(repo['env_dir'], modules_dir) == before
+
+
+def test_check_skips_after_clean_plan(repo):
+    assert run(repo, 'check') == cache.EXIT_PLAN
+    assert run(repo, 'record', '--exit-code', '0') == 0
+    assert run(repo, 'check') == cache.EXIT_SKIP
+
+
+def test_check_plans_when_module_changes(repo):
+    run(repo, 'record', '--exit-code', '0')
+    repo['module_file'].write_text('resource "aws_vpc" "other" {}\n')
+    assert run(repo, 'check') == cache.EXIT_PLAN
+
+
+@pytest.mark.parametrize('serial, lineage', [(4, 'abc'), (3, 'xyz')])
+def test_check_plans_when_state_changes(repo, serial, lineage):
+    run(repo, 'record', '--exit-code', '0')
+    write_state(repo['root'] / 'terraform.tfstate', serial=serial, lineage=lineage)
+    assert run(repo, 'check') == cache.EXIT_PLAN
+
+
+@pytest.mark.parametrize('exit_code', [1, 2])
+def test_check_plans_after_non_clean_plan(repo, exit_code):
+    run(repo, 'record', '--exit-code', str(exit_code))
+    assert run(repo, 'check') == cache.EXIT_PLAN
+
+
+def test_failed_plan_replaces_clean_entry(repo):
+    run(repo, 'record', '--exit-code', '0')
+    assert run(repo, 'check') == cache.EXIT_SKIP
+
+    run(repo, 'record', '--exit-code', '1')
+    assert run(repo, 'check') == cache.EXIT_PLAN
+
+
+def test_unreadable_state_discards_entry(repo):
+    run(repo, 'record', '--exit-code', '0')
+    (repo['root'] / 'terraform.tfstate').write_text('{not json')
+    assert run(repo, 'record', '--exit-code', '1') == 0
+
+    with open(repo['cache_file']) as f:
+        assert 'dev/default' not in json.load(f)['entries']
+
+
+def test_check_plans_when_entry_expired(repo):
+    started_at = (datetime.now(timezone.utc) - timedelta(hours=37)).isoformat()
+    run(repo, 'record', '--exit-code', '0', '--started-at', started_at)
+    assert run(repo, 'check', '--max-age-hours', '36') == cache.EXIT_PLAN
+    assert run(repo, 'check', '--max-age-hours', '48') == cache.EXIT_SKIP
+
+
+def test_record_stores_plan_start_time(repo):
+    run(repo, 'record', '--exit-code', '0', '--started-at', '2025-12-04T06:00:00')
+    with open(repo['cache_file']) as f:
+        entry = json.load(f)['entries']['dev/default']
+    assert entry['planned_at'] == '2025-12-04T06:00:00+00:00'
+
+
+def test_is_fresh_uses_max_age():
+    planned_at = datetime(2025, 12, 4, 6, 0, tzinfo=timezone.utc)
+    entry = {'exit_code': 0, 'fingerprint': 'f', 'serial': 1, 'lineage': 'l', 'planned_at': planned_at.isoformat()}
+    state = {'serial': 1, 'lineage': 'l'}
+
+    fresh, _ = cache.is_fresh(entry, 'f', state, timedelta(hours=36), now=planned_at + timedelta(hours=24, minutes=5))
+    assert fresh
+    fresh, reason = cache.is_fresh(entry, 'f', state, timedelta(hours=36), now=planned_at + timedelta(hours=48))
+    assert not fresh
+    assert reason == "el plan en cache expiró"
+
+
+def test_cache_key_uses_environment_name(repo, monkeypatch):
+    monkeypatch.chdir(repo['env_dir'])
+    assert cache.cache_key('.', 'default') == 'dev/default'
+    assert cache.cache_key(repo['env_dir'], 'default') == 'dev/default'
+
+
+@pytest.mark.parametrize('content', ['{not json', json.dumps({'version': 0, 'entries': {}})])
+def test_corrupt_or_old_cache_is_ignored(repo, content):
+    run(repo, 'record', '--exit-code', '0')
+    with open(repo['cache_file'], 'w') as f:
+        f.write(content)
+
+    assert run(repo, 'check') == cache.EXIT_PLAN
+    assert run(repo, 'record', '--exit-code', '0') == 0
+    assert run(repo, 'check') == cache.EXIT_SKIP
+
+
+def test_empty_state_is_cacheable(repo):
+    (repo['root'] / 'terraform.tfstate').write_text('')
+    run(repo, 'record', '--exit-code', '0')
+    assert run(repo, 'check') == cache.EXIT_SKIP